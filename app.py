@@ -1,10 +1,15 @@
 import streamlit as st
+import gc
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 from PIL import Image
 from io import BytesIO
-from huggingface_hub import InferenceClient
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +17,21 @@ load_dotenv()
 # Configuration
 HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 MODEL_NAME = "stabilityai/stable-diffusion-xl-base-1.0"
+THUMBNAIL_SIZE = (384, 384)
+HISTORY_SIZE = 10
+MAX_WORKERS = 4
+MAX_BATCH_SIZE = HISTORY_SIZE
+CACHE_HIT_THRESHOLD = 0.05  # seconds; faster calls are assumed to be cache hits
+
+# Replaces spaces and filesystem-unsafe characters in download file names
+_FN_TRANS = str.maketrans({c: '_' for c in ' /\\:*?"<>|'})
+
+# User-facing messages for HTTP errors from the inference API
+GENERATION_ERROR_MESSAGES = {
+    503: "⏳ Model is currently loading. Please wait a moment and try again.",
+    429: "⚠️ Rate limit reached. Please wait a few minutes before trying again.",
+    401: "🔒 Authentication failed. Please check your HuggingFace token has 'Write' permissions.",
+}
 
 # Style presets
 STYLE_PRESETS = {
@@ -24,9 +44,7 @@ STYLE_PRESETS = {
     "Cyberpunk": ", cyberpunk style, neon lights, futuristic, sci-fi, dark atmosphere",
     "Fantasy": ", fantasy art, magical, enchanted, epic scene, mystical atmosphere",
 }
-
-# Initialize InferenceClient
-client = InferenceClient(token=HUGGINGFACE_TOKEN)
+STYLE_KEYS = tuple(STYLE_PRESETS.keys())
 
 # Page configuration
 st.set_page_config(
@@ -35,39 +53,228 @@ st.set_page_config(
     layout="centered"
 )
 
-def generate_image(prompt):
+@st.cache_resource(show_spinner=False)
+def get_client():
+    """
+    Get a shared HuggingFace InferenceClient
+
+    The client is cached across reruns so its HTTP connection pool
+    (and keep-alive connection to huggingface.co) is reused.
+
+    Returns:
+        InferenceClient: Client authenticated with HUGGINGFACE_TOKEN
+    """
+    # Imported here so the heavy huggingface_hub import doesn't delay the first page render
+    from huggingface_hub import InferenceClient
+
+    return InferenceClient(token=HUGGINGFACE_TOKEN)
+
+def _warm_up_model(client):
+    """Send a tiny generation request so the model is loaded before the first real one."""
+    try:
+        client.text_to_image("a", model=MODEL_NAME, width=256, height=256)
+    except Exception:
+        # Warm-up is best effort; real requests report their own errors
+        pass
+
+@st.cache_resource
+def start_model_warm_up():
+    """
+    Warm up the model in a background thread, once per server process
+
+    The first request after the endpoint has been idle otherwise fails with
+    a 503 "model loading" error.
+    """
+    # Create the client here, on the script thread, so the cache miss runs with a script context
+    client = get_client()
+    threading.Thread(target=_warm_up_model, args=(client,), daemon=True).start()
+
+@st.cache_data(ttl=24 * 60 * 60, max_entries=64, show_spinner=False)
+def generate_image(prompt, model):
     """
     Generate an image using HuggingFace InferenceClient
 
+    Results are memoized on (prompt, model), so regenerating an identical
+    prompt returns instantly. Errors are raised rather than returned so
+    that failures are never cached.
+
     Args:
         prompt (str): Text description of the image to generate
+        model (str): HuggingFace model ID to generate with
+
+    Returns:
+        bytes: Generated image encoded as PNG
+    """
+    client = get_client()
+
+    # Use InferenceClient's text_to_image method
+    image = client.text_to_image(prompt, model=model)
+
+    # Return PNG bytes so the cached value is cheap to hash and pickle.
+    # Low compression encodes several times faster for a modestly larger file.
+    with BytesIO() as buf:
+        image.save(buf, format="PNG", compress_level=1)
+        return buf.getvalue()
+
+@st.cache_resource
+def get_cache_stats():
+    """
+    Get the server-wide hit/miss counters for generate_image
+
+    The counters are shared by every session, so reads and updates must
+    hold the returned lock.
 
     Returns:
-        PIL.Image: Generated image or None if failed
+        dict: Hit and miss counts, total time spent on and saved by the cache,
+            and a 'lock' guarding them
+    """
+    return {'hits': 0, 'misses': 0, 'miss_time': 0.0, 'time_saved': 0.0, 'lock': threading.Lock()}
+
+def record_cache_stats(elapsed):
+    """
+    Classify a successful generate_image call as a cache hit or miss
+
+    Args:
+        elapsed (float): Wall-clock seconds the call took
     """
+    stats = get_cache_stats()
+    with stats['lock']:
+        if elapsed < CACHE_HIT_THRESHOLD:
+            stats['hits'] += 1
+            # Estimate the saving as the average cost of a real API call
+            if stats['misses']:
+                stats['time_saved'] += stats['miss_time'] / stats['misses'] - elapsed
+        else:
+            stats['misses'] += 1
+            stats['miss_time'] += elapsed
+
+def _generate_or_error(prompt):
+    """Run generate_image, returning (result, elapsed) where result may be the raised exception."""
+    start = time.perf_counter()
     try:
-        # Use InferenceClient's text_to_image method
-        image = client.text_to_image(prompt, model=MODEL_NAME)
-        return image
+        result = generate_image(prompt, MODEL_NAME)
     except Exception as e:
-        error_msg = str(e)
-
-        # Handle specific error cases
-        if "503" in error_msg or "loading" in error_msg.lower():
-            st.error("⏳ Model is currently loading. Please wait a moment and try again.")
-        elif "429" in error_msg or "rate limit" in error_msg.lower():
-            st.error("⚠️ Rate limit reached. Please wait a few minutes before trying again.")
-        elif "401" in error_msg or "unauthorized" in error_msg.lower():
-            st.error("🔒 Authentication failed. Please check your HuggingFace token has 'Write' permissions.")
-        else:
-            st.error(f"❌ An error occurred: {error_msg}")
+        result = e
+    return result, time.perf_counter() - start
+
+def generate_images(prompts):
+    """
+    Generate images for several prompts concurrently
+
+    Args:
+        prompts (list[str]): Text descriptions of the images to generate
+
+    Returns:
+        list: PNG bytes or the raised Exception for each prompt, in order
+    """
+    # Generate each distinct prompt once; duplicates would only wait on the first call
+    unique_prompts = list(dict.fromkeys(prompts))
+
+    # A single prompt doesn't need a worker thread
+    if len(unique_prompts) == 1:
+        timed_results = [_generate_or_error(unique_prompts[0])]
+    else:
+        # Give the workers this script run's context so the cached calls can run outside the script thread
+        ctx = get_script_run_ctx()
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_WORKERS, len(unique_prompts)),
+            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+        ) as executor:
+            timed_results = list(executor.map(_generate_or_error, unique_prompts))
+
+    # Failures are never cached, so only successful calls count toward the stats
+    for result, elapsed in timed_results:
+        if not isinstance(result, Exception):
+            record_cache_stats(elapsed)
+
+    results = {p: result for p, (result, _) in zip(unique_prompts, timed_results)}
+    return [results[p] for p in prompts]
+
+def show_generation_error(error):
+    """
+    Display a user-friendly message for a failed generation
+
+    Args:
+        error (Exception): Exception raised by generate_image
+    """
+    from huggingface_hub.utils import HfHubHTTPError
+
+    fallback = f"❌ An error occurred: {error}"
+
+    # Handle specific HTTP error cases by status code
+    if isinstance(error, HfHubHTTPError):
+        response = error.response
+        status_code = response.status_code if response is not None else None
+        st.error(GENERATION_ERROR_MESSAGES.get(status_code, fallback))
+    else:
+        st.error(fallback)
+
+@st.fragment
+def render_gallery():
+    """
+    Render the image history gallery
+
+    Runs as a fragment so gallery interactions (downloads, clearing history)
+    only rerun this section instead of the whole script.
+    """
+    if st.session_state.image_history:
+        st.markdown("---")
+        st.header(f"🖼️ Image History ({len(st.session_state.image_history)}/{HISTORY_SIZE})")
+
+        # Clear history button
+        col1, col2, col3 = st.columns([1, 1, 1])
+        with col3:
+            # Clear in a callback so the gallery is rebuilt already empty, without an explicit rerun
+            st.button(
+                "🗑️ Clear History",
+                on_click=st.session_state.image_history.clear,
+                use_container_width=True
+            )
+
+        # Display images in a grid (3 columns)
+        cols = st.columns(3)
+        for idx, img_data in enumerate(st.session_state.image_history):
+            with cols[idx % 3]:
+                # Display image
+                st.image(img_data['thumb'], use_container_width=True)
 
-        return None
+                # Show style badge
+                style_text = f"**{img_data['style']}**" if img_data['style'] != "None" else "No style"
+                st.caption(style_text)
+
+                # Show prompt in expander
+                with st.expander("View prompt", expanded=False):
+                    st.write(img_data['prompt'])
+                    if img_data['style'] != "None":
+                        st.caption(f"Enhanced: {img_data['enhanced_prompt']}")
+
+                # Download button for each image
+                st.download_button(
+                    label="⬇️ Download",
+                    data=img_data['png'],
+                    file_name=f"ai_generated_{img_data['prompt'][:30].translate(_FN_TRANS)}_{idx}.png",
+                    mime="image/png",
+                    use_container_width=True,
+                    key=f"download_{idx}"
+                )
+
+@st.cache_resource
+def freeze_startup_objects():
+    """
+    Move objects that exist at startup out of the garbage collector's reach
+
+    Runs once per server process, before the first main(), so later
+    collections don't keep rescanning Streamlit and library objects. The
+    first run's script namespace is frozen too and is never reclaimed; this
+    one-off leak of module-level definitions (no session data) is accepted.
+    """
+    gc.collect()
+    gc.freeze()
 
 def main():
     # Initialize session state for image history
     if 'image_history' not in st.session_state:
-        st.session_state.image_history = []
+        st.session_state.image_history = deque(maxlen=HISTORY_SIZE)
 
     # Header
     st.title("🎨 AI Image Generator")
@@ -84,12 +291,14 @@ def main():
         """)
         st.stop()
 
+    start_model_warm_up()
+
     # Sidebar with information
     with st.sidebar:
         st.header("🎨 Style Preset")
         selected_style = st.selectbox(
             "Choose a style:",
-            options=list(STYLE_PRESETS.keys()),
+            options=STYLE_KEYS,
             index=0,
             help="Select a style to automatically enhance your prompt"
         )
@@ -111,6 +320,7 @@ def main():
         st.write("- Include style, mood, and details")
         st.write("- Mention lighting and colors")
         st.write("- Or use a style preset above!")
+        st.write("- Put each prompt on its own line to generate a batch")
 
         st.markdown("---")
 
@@ -132,7 +342,7 @@ def main():
         "✍️ Enter your image description:",
         placeholder="Example: A magical forest with glowing mushrooms, fantasy art style, vibrant colors",
         height=120,
-        help="Describe the image you want to generate. Be as detailed as possible!"
+        help=f"Describe the image you want to generate. Be as detailed as possible! Enter one prompt per line to generate up to {MAX_BATCH_SIZE} images at once."
     )
 
     # Generate button
@@ -142,99 +352,91 @@ def main():
 
     # Generation logic
     if generate_button:
-        if not prompt.strip():
+        # One prompt per non-empty line
+        prompts = [line.strip() for line in prompt.split('\n') if line.strip()]
+        if len(prompts) > MAX_BATCH_SIZE:
+            st.warning(
+                f"⚠️ Only the first {MAX_BATCH_SIZE} prompts will be generated; "
+                f"{len(prompts) - MAX_BATCH_SIZE} extra line(s) were skipped."
+            )
+            prompts = prompts[:MAX_BATCH_SIZE]
+
+        if not prompts:
             st.warning("⚠️ Please enter a description for your image.")
         else:
-            # Combine prompt with style
+            # Combine prompts with style
             style_suffix = STYLE_PRESETS[selected_style]
-            enhanced_prompt = prompt.strip() + style_suffix
+            enhanced_prompts = [f"{p}{style_suffix}" for p in prompts]
 
-            # Show the enhanced prompt if a style is applied
+            # Show the enhanced prompts if a style is applied
             if selected_style != "None":
                 with st.expander("🔍 View Enhanced Prompt", expanded=False):
-                    st.code(enhanced_prompt)
-
-            with st.spinner("🎨 Creating your image... This may take 10-30 seconds..."):
-                image = generate_image(enhanced_prompt)
-
-                if image:
-                    st.success("✅ Image generated successfully!")
-
-                    # Save to history
-                    image_data = {
-                        'image': image,
-                        'prompt': prompt.strip(),
-                        'enhanced_prompt': enhanced_prompt,
-                        'style': selected_style,
-                        'timestamp': datetime.now()
-                    }
-                    st.session_state.image_history.insert(0, image_data)
-
-                    # Limit to 10 images
-                    if len(st.session_state.image_history) > 10:
-                        st.session_state.image_history = st.session_state.image_history[:10]
-
-                    # Display the generated image
-                    caption = f"{prompt}" if selected_style == "None" else f"{prompt} ({selected_style} style)"
-                    st.image(image, caption=caption, use_container_width=True)
-
-                    # Download button
-                    buf = BytesIO()
-                    image.save(buf, format="PNG")
-                    byte_im = buf.getvalue()
-
-                    col1, col2, col3 = st.columns([1, 2, 1])
-                    with col2:
-                        st.download_button(
-                            label="⬇️ Download Image",
-                            data=byte_im,
-                            file_name=f"ai_generated_{prompt[:30].replace(' ', '_')}.png",
-                            mime="image/png",
-                            use_container_width=True
-                        )
+                    for enhanced_prompt in enhanced_prompts:
+                        st.code(enhanced_prompt)
+
+            if len(prompts) == 1:
+                spinner_text = "🎨 Creating your image... This may take 10-30 seconds..."
+            else:
+                spinner_text = f"🎨 Creating {len(prompts)} images in parallel... This may take 10-30 seconds or more..."
+
+            with st.spinner(spinner_text):
+                results = generate_images(enhanced_prompts)
+
+            for i, (prompt_stripped, enhanced_prompt, result) in enumerate(zip(prompts, enhanced_prompts, results)):
+                if isinstance(result, Exception):
+                    show_generation_error(result)
+                    continue
+
+                png_bytes = result
+                image = Image.open(BytesIO(png_bytes))
+                st.success("✅ Image generated successfully!")
+
+                # Save to history as compressed bytes (WebP thumbnail for display, PNG for download)
+                thumb = image.copy()
+                thumb.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+                with BytesIO() as buf:
+                    thumb.save(buf, format="WEBP", quality=80)
+                    thumb_bytes = buf.getvalue()
+                image_data = {
+                    'thumb': thumb_bytes,
+                    'png': png_bytes,
+                    'prompt': prompt_stripped,
+                    'enhanced_prompt': enhanced_prompt,
+                    'style': selected_style,
+                    'timestamp': datetime.now()
+                }
+                # The bounded deque drops the oldest image beyond HISTORY_SIZE
+                st.session_state.image_history.appendleft(image_data)
+
+                # Display the generated image
+                caption = f"{prompt_stripped}" if selected_style == "None" else f"{prompt_stripped} ({selected_style} style)"
+                st.image(image, caption=caption, use_container_width=True)
+
+                # Download button
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col2:
+                    st.download_button(
+                        label="⬇️ Download Image",
+                        data=png_bytes,
+                        file_name=f"ai_generated_{prompt_stripped[:30].translate(_FN_TRANS)}.png",
+                        mime="image/png",
+                        use_container_width=True,
+                        key=f"download_new_{i}"
+                    )
 
     # Image History Gallery
-    if st.session_state.image_history:
-        st.markdown("---")
-        st.header(f"🖼️ Image History ({len(st.session_state.image_history)}/10)")
+    render_gallery()
 
-        # Clear history button
-        col1, col2, col3 = st.columns([1, 1, 1])
-        with col3:
-            if st.button("🗑️ Clear History", use_container_width=True):
-                st.session_state.image_history = []
-                st.rerun()
-
-        # Display images in a grid (3 columns)
-        cols = st.columns(3)
-        for idx, img_data in enumerate(st.session_state.image_history):
-            with cols[idx % 3]:
-                # Display image
-                st.image(img_data['image'], use_container_width=True)
-
-                # Show style badge
-                style_text = f"**{img_data['style']}**" if img_data['style'] != "None" else "No style"
-                st.caption(style_text)
-
-                # Show prompt in expander
-                with st.expander("View prompt", expanded=False):
-                    st.write(img_data['prompt'])
-                    if img_data['style'] != "None":
-                        st.caption(f"Enhanced: {img_data['enhanced_prompt']}")
-
-                # Download button for each image
-                buf = BytesIO()
-                img_data['image'].save(buf, format="PNG")
-                byte_im = buf.getvalue()
-
-                st.download_button(
-                    label="⬇️ Download",
-                    data=byte_im,
-                    file_name=f"ai_generated_{img_data['prompt'][:20].replace(' ', '_')}_{idx}.png",
-                    mime="image/png",
-                    use_container_width=True,
-                    key=f"download_{idx}"
-                )
+    # Cache statistics (rendered last so they include this run's generations)
+    with st.sidebar:
+        stats = get_cache_stats()
+        with stats['lock']:
+            hits, misses, time_saved = stats['hits'], stats['misses'], stats['time_saved']
+        total = hits + misses
+        with st.expander("📊 Cache Stats (server-wide)", expanded=False):
+            st.metric("Cache hit ratio", f"{hits / total:.0%}" if total else "—")
+            st.write(f"**Hits:** {hits} · **Misses:** {misses}")
+            st.write(f"**Time saved:** {time_saved:.1f}s")
 
     # Footer
     st.markdown("---")
@@ -244,4 +446,5 @@ def main():
     )
 
 if __name__ == "__main__":
+    freeze_startup_objects()
     main()